@@ -1,9 +1,9 @@
+import argparse
 import json
 import random
 import os
 import uuid
 import boto3
-from faker import Faker
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -12,6 +12,8 @@ load_dotenv()
 AWS_REGION = os.getenv("AWS_REGION")
 BUCKET_NAME = os.getenv("AWS_S3_BUCKET_NAME")
 
+CLAIMS_TABLE = os.getenv("CLAIMS_TABLE", "northstar-claims")
+
 # Initialize S3 client
 s3 = boto3.client(
     "s3",
@@ -20,9 +22,30 @@ s3 = boto3.client(
     aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
 )
 
-fake = Faker()
+# Claims are served from DynamoDB at runtime
+dynamodb = boto3.resource(
+    "dynamodb",
+    region_name=AWS_REGION,
+    aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
+    aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+)
+claims_table = dynamodb.Table(CLAIMS_TABLE)
+
 random.seed(1995)
-Faker.seed(1995)
+
+# Static customer names; avoids importing faker just to draw 50 names
+FIRST_NAMES = [
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael",
+    "Linda", "David", "Elizabeth", "William", "Barbara", "Richard", "Susan",
+    "Joseph", "Jessica", "Thomas", "Sarah", "Carlos", "Maria"
+]
+
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez"
+]
+
+NAMES = [f"{first} {last}" for first in FIRST_NAMES for last in LAST_NAMES]
 
 # Paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -31,7 +54,18 @@ PROJECT_ROOT = os.path.dirname(BASE_DIR) + "/Database_Generation"
 OUTPUT_DIR = os.path.join(PROJECT_ROOT, "data")
 CLAIMS_DIR = os.path.join(OUTPUT_DIR, "claims")
 
-os.makedirs(CLAIMS_DIR, exist_ok=True)
+# Keep local copies of the generated JSON (--keep-local)
+KEEP_LOCAL = False
+
+# Pretty-print the JSON for debugging (--pretty); compact by default
+# since the files are machine-consumed
+PRETTY = False
+
+
+def dump_json(data):
+    if PRETTY:
+        return json.dumps(data, indent=2)
+    return json.dumps(data, separators=(",", ":"))
 
 # Config
 NUM_POLICIES = 50
@@ -53,8 +87,13 @@ DOCUMENT_RULES = {
 }
 
 
-def upload_to_s3(local_path, s3_key):
-    s3.upload_file(local_path, BUCKET_NAME, s3_key)
+def upload_json_to_s3(data, s3_key):
+    s3.put_object(
+        Bucket=BUCKET_NAME,
+        Key=s3_key,
+        Body=dump_json(data).encode(),
+        ContentType="application/json",
+    )
     print(f"Uploaded {s3_key} to S3")
 
 
@@ -68,7 +107,7 @@ def generate_policies():
 
         policies[policy_id] = {
             "policy_id": policy_id,
-            "customer_name": fake.name(),
+            "customer_name": random.choice(NAMES),
             "state": random.choice(STATES),
             "coverage_limit": random.choice([10000, 15000, 25000, 50000]),
             "deductible": random.choice([500, 1000, 2000]),
@@ -106,25 +145,38 @@ def generate_claim(policy):
 def generate_claims(policies):
     policy_list = list(policies.values())
 
+    claims = {}
+
     for _ in range(NUM_CLAIMS):
-        policy = random.choice(policy_list)
-        claim = generate_claim(policy)
+        claim = generate_claim(random.choice(policy_list))
+        claims[claim["claim_id"]] = claim
 
-        local_path = os.path.join(CLAIMS_DIR, f"{claim['claim_id']}.json")
+    if KEEP_LOCAL:
+        for claim_id, claim in claims.items():
+            local_path = os.path.join(CLAIMS_DIR, f"{claim_id}.json")
 
-        with open(local_path, "w") as f:
-            json.dump(claim, f, indent=4)
+            with open(local_path, "w") as f:
+                f.write(dump_json(claim))
 
-        upload_to_s3(local_path, f"claims/{claim['claim_id']}.json")
+    # DynamoDB is the runtime lookup store for get_claim_status
+    with claims_table.batch_writer() as batch:
+        for claim in claims.values():
+            batch.put_item(Item=claim)
+
+    print(f"Wrote {len(claims)} claims to {CLAIMS_TABLE}")
+
+    # S3 copy kept for archival only
+    upload_json_to_s3(claims, "claims/claims.json")
 
 
 def save_and_upload_json(data, filename, s3_key):
-    local_path = os.path.join(OUTPUT_DIR, filename)
+    if KEEP_LOCAL:
+        local_path = os.path.join(OUTPUT_DIR, filename)
 
-    with open(local_path, "w") as f:
-        json.dump(data, f, indent=4)
+        with open(local_path, "w") as f:
+            f.write(dump_json(data))
 
-    upload_to_s3(local_path, s3_key)
+    upload_json_to_s3(data, s3_key)
 
 
 def main():
@@ -142,4 +194,23 @@ def main():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate insurance data and upload to S3")
+    parser.add_argument(
+        "--keep-local",
+        action="store_true",
+        help="Also write the generated JSON files under data/"
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="Indent the generated JSON instead of compact output"
+    )
+    args = parser.parse_args()
+
+    KEEP_LOCAL = args.keep_local
+    PRETTY = args.pretty
+
+    if KEEP_LOCAL:
+        os.makedirs(CLAIMS_DIR, exist_ok=True)
+
     main()
@@ -1,14 +1,24 @@
-import json
+import hashlib
+import orjson
 import os
+import random
 import time
 import logging
+import queue
+import threading
 import boto3
+from collections import OrderedDict
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 from boto3.dynamodb.conditions import Key
-from datetime import datetime
 import re
-import requests
+from urllib.parse import urlparse
+from opensearchpy import OpenSearch, RequestsHttpConnection
 from requests_aws4auth import AWS4Auth
 
+import tools
+
 # =====================================================
 # Logging
 # =====================================================
@@ -17,7 +27,7 @@ logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
 def log(stage, data):
-    logger.info(json.dumps({"stage": stage, "data": data}))
+    logger.info(orjson.dumps({"stage": stage, "data": data}).decode())
 
 # =====================================================
 # Environment
@@ -33,10 +43,6 @@ ROUTER_MODEL = get_env("AWS_BEDROCK_ROUTER_MODEL")
 SYNTH_MODEL = get_env("AWS_BEDROCK_SYNTH_MODEL")
 FALLBACK_MODEL = get_env("AWS_BEDROCK_FALLBACK_MODEL")
 
-GET_POLICY_FUNCTION = get_env("GET_POLICY_FUNCTION")
-CHECK_DOC_FUNCTION = get_env("CHECK_DOC_FUNCTION")
-GET_CLAIM_FUNCTION = get_env("GET_CLAIM_FUNCTION")
-
 CONVERSATION_TABLE = get_env("CONVERSATION_TABLE")
 
 OPENSEARCH_ENDPOINT = get_env("OPENSEARCH_ENDPOINT")
@@ -48,90 +54,348 @@ AWS_REGION = os.environ.get("AWS_REGION", "eu-north-1")
 # AWS Clients
 # =====================================================
 
-lambda_client = boto3.client("lambda")
-bedrock = boto3.client("bedrock-runtime", region_name=AWS_REGION)
-dynamodb = boto3.resource("dynamodb")
+# Larger pool (threads share these clients), adaptive retry instead of
+# legacy exponential backoff, and TCP keepalive for warm reuse
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True
+)
+
+bedrock = boto3.client("bedrock-runtime", region_name=AWS_REGION, config=BOTO_CONFIG)
+dynamodb = boto3.resource("dynamodb", config=BOTO_CONFIG)
 table = dynamodb.Table(CONVERSATION_TABLE)
 
+# Force botocore to parse each service model during the init phase,
+# so the first invocation does not pay for lazy loading
+for _client in (bedrock, dynamodb.meta.client):
+    _client.meta.service_model.operation_names
+
 # =====================================================
 # OpenSearch Auth (Refreshable)
 # =====================================================
 
+_session = boto3.Session()
+_credentials = _session.get_credentials()
+
+# AWS4Auth re-derives its signing key on construction, so keep one cached
+# instance and only re-freeze the credentials every few minutes to catch
+# execution-role rotation in long-lived warm containers
+AUTH_RECHECK_SECONDS = 600
+
+_auth = None
+_auth_token = None
+_auth_checked_at = 0.0
+
+
 def get_awsauth():
-    session = boto3.Session()
-    credentials = session.get_credentials()
-    frozen = credentials.get_frozen_credentials()
-
-    return AWS4Auth(
-        frozen.access_key,
-        frozen.secret_key,
-        AWS_REGION,
-        "aoss",
-        session_token=frozen.token
-    )
+    global _auth, _auth_token, _auth_checked_at
+
+    now = time.time()
+
+    if _auth is not None and now - _auth_checked_at < AUTH_RECHECK_SECONDS:
+        return _auth
+
+    frozen = _credentials.get_frozen_credentials()
+    _auth_checked_at = now
+
+    if _auth is None or frozen.token != _auth_token:
+        _auth = AWS4Auth(
+            frozen.access_key,
+            frozen.secret_key,
+            AWS_REGION,
+            "aoss",
+            session_token=frozen.token
+        )
+        _auth_token = frozen.token
+
+    return _auth
+
+# =====================================================
+# Background Executor
+# =====================================================
+
+# Shared pool for the independent network calls lambda_handler overlaps
+# (history read, RAG retrieval); persists across warm invocations
+executor = ThreadPoolExecutor(max_workers=4)
+
+# =====================================================
+# OpenSearch Client
+# =====================================================
+
+def _signed_auth(request):
+    # Indirection so the client always signs with the current cached
+    # AWS4Auth even after credential rotation
+    return get_awsauth()(request)
+
+
+opensearch = OpenSearch(
+    hosts=[{"host": urlparse(OPENSEARCH_ENDPOINT).hostname, "port": 443}],
+    http_auth=_signed_auth,
+    use_ssl=True,
+    verify_certs=True,
+    connection_class=RequestsHttpConnection,
+    pool_maxsize=20,
+    http_compress=True,
+    timeout=5
+)
 
 # =====================================================
 # Utilities
 # =====================================================
 
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+
+
 def safe_json(text):
     try:
-        return json.loads(text)
+        return orjson.loads(text)
     except Exception:
-        match = re.search(r"\{.*\}", text, re.DOTALL)
+        match = _JSON_RE.search(text)
         if match:
-            return json.loads(match.group())
+            return orjson.loads(match.group())
         raise
 
 # =====================================================
 # Embedding
 # =====================================================
 
+# Dedupe identical texts across calls (e.g. repeated queries, repeated
+# chunks) so each unique string is embedded at most once per container.
+# LRU-capped like the RAG cache: each vector is ~1024 floats and a
+# provisioned container stays warm for days
+EMBED_CACHE_MAX = 256
+
+_embedding_cache = OrderedDict()
+_embedding_cache_lock = threading.Lock()
+
+
 def embed_text(text):
+    with _embedding_cache_lock:
+        cached = _embedding_cache.get(text)
+        if cached is not None:
+            _embedding_cache.move_to_end(text)
+            return cached
+
     response = bedrock.invoke_model(
         modelId="amazon.titan-embed-text-v2:0",
-        body=json.dumps({"inputText": text}),
+        body=orjson.dumps({"inputText": text}),
         contentType="application/json",
         accept="application/json"
     )
 
-    result = json.loads(response["body"].read())
-    return result["embedding"]
+    result = orjson.loads(response["body"].read())
+    embedding = result["embedding"]
+
+    with _embedding_cache_lock:
+        _embedding_cache[text] = embedding
+        _embedding_cache.move_to_end(text)
+
+        while len(_embedding_cache) > EMBED_CACHE_MAX:
+            _embedding_cache.popitem(last=False)
+
+    return embedding
+
+
+def embed_texts(texts):
+    # Titan v2 only accepts one inputText per invocation, so batch by
+    # fanning the independent calls out over a thread pool
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(embed_text, texts))
+
+# =====================================================
+# RAG Cache
+# =====================================================
+
+# LRU of recent retrievals: exact hits by normalized-query hash, near
+# hits by random-projection LSH buckets verified with cosine similarity.
+# RAG_CACHE_BUST lets a deploy invalidate everything via env change.
+RAG_CACHE_MAX = 512
+RAG_CACHE_TTL = 600
+RAG_CACHE_SIM = 0.95
+RAG_CACHE_BUST = os.environ.get("RAG_CACHE_BUST", "")
+
+# Two 8-bit signatures per vector: near-duplicate queries land in the
+# same bucket, so a semantic lookup verifies a handful of candidates
+# instead of scanning every cached vector. Multi-probing each table
+# with single-bit flips recovers entries that straddle a hyperplane.
+RAG_LSH_TABLES = 2
+RAG_LSH_BITS = 8
+RAG_EMBED_DIM = 1024
+
+# Fixed seed: every container hashes into identical buckets
+_lsh_rng = random.Random(20250817)
+_lsh_planes = [
+    [
+        [_lsh_rng.gauss(0.0, 1.0) for _ in range(RAG_EMBED_DIM)]
+        for _ in range(RAG_LSH_BITS)
+    ]
+    for _ in range(RAG_LSH_TABLES)
+]
+
+_rag_cache = OrderedDict()
+_rag_lsh_buckets = {}
+_rag_cache_lock = threading.Lock()
+
+
+def _rag_cache_key(query):
+    normalized = RAG_CACHE_BUST + query.lower().strip()
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def _cosine(vec_a, norm_a, vec_b, norm_b):
+    if not norm_a or not norm_b:
+        return 0.0
+    dot = sum(a * b for a, b in zip(vec_a, vec_b))
+    return dot / (norm_a * norm_b)
+
+
+def _lsh_signatures(vector):
+    signatures = []
+
+    for planes in _lsh_planes:
+        signature = 0
+        for plane in planes:
+            dot = sum(p * v for p, v in zip(plane, vector))
+            signature = (signature << 1) | (dot >= 0.0)
+        signatures.append(signature)
+
+    return signatures
+
+
+def _lsh_add(key, signatures):
+    for table, signature in enumerate(signatures):
+        _rag_lsh_buckets.setdefault((table, signature), set()).add(key)
+
+
+def _lsh_remove(key, signatures):
+    for table, signature in enumerate(signatures):
+        bucket = _rag_lsh_buckets.get((table, signature))
+        if bucket:
+            bucket.discard(key)
+            if not bucket:
+                del _rag_lsh_buckets[(table, signature)]
+
+
+def _rag_cache_delete(key):
+    entry = _rag_cache.pop(key, None)
+    if entry is not None:
+        _lsh_remove(key, entry[4])
+
+
+def _rag_cache_get(key):
+    with _rag_cache_lock:
+        entry = _rag_cache.get(key)
+
+        if entry is None:
+            return None
+
+        if entry[0] < time.time():
+            _rag_cache_delete(key)
+            return None
+
+        _rag_cache.move_to_end(key)
+        return entry[3]
+
+
+def _rag_cache_find_similar(vector, signatures):
+    norm = sum(v * v for v in vector) ** 0.5
+
+    with _rag_cache_lock:
+        candidates = set()
+
+        for table, signature in enumerate(signatures):
+            probes = [signature]
+            probes.extend(signature ^ (1 << bit) for bit in range(RAG_LSH_BITS))
+
+            for probe in probes:
+                candidates |= _rag_lsh_buckets.get((table, probe), set())
+
+        now = time.time()
+
+        for key in candidates:
+            entry = _rag_cache.get(key)
+            if entry is None or entry[0] < now:
+                continue
+            if _cosine(vector, norm, entry[1], entry[2]) >= RAG_CACHE_SIM:
+                return entry[3]
+
+    return None
+
+
+def _rag_cache_put(key, vector, signatures, texts):
+    norm = sum(v * v for v in vector) ** 0.5
+
+    with _rag_cache_lock:
+        _rag_cache_delete(key)
+        _rag_cache[key] = (time.time() + RAG_CACHE_TTL, vector, norm, texts, signatures)
+        _lsh_add(key, signatures)
+
+        while len(_rag_cache) > RAG_CACHE_MAX:
+            oldest = next(iter(_rag_cache))
+            _rag_cache_delete(oldest)
 
 # =====================================================
 # RAG Retrieval
 # =====================================================
 
+# When the index stores byte vectors, RAG_VECTOR_INT8=1 sends the query
+# vector quantized to int8 as well: the JSON payload shrinks to roughly
+# a quarter of the float form. Off by default - the flag must match how
+# the index mapping was created.
+RAG_VECTOR_INT8 = os.environ.get("RAG_VECTOR_INT8", "") == "1"
+
+
+def _quantize_int8(vector):
+    max_abs = max(abs(v) for v in vector)
+    if not max_abs:
+        return [0] * len(vector)
+    scale = 127.0 / max_abs
+    return [max(-128, min(127, round(v * scale))) for v in vector]
+
+
 def retrieve_context(query, top_k=3):
     try:
+        cache_key = _rag_cache_key(query)
+
+        cached = _rag_cache_get(cache_key)
+        if cached is not None:
+            log("rag_cache_hit", "exact")
+            return cached
+
         vector = embed_text(query)
+        signatures = _lsh_signatures(vector)
+
+        similar = _rag_cache_find_similar(vector, signatures)
+        if similar is not None:
+            log("rag_cache_hit", "semantic")
+            _rag_cache_put(cache_key, vector, signatures, similar)
+            return similar
+
+        search_vector = _quantize_int8(vector) if RAG_VECTOR_INT8 else vector
 
         search_body = {
             "size": top_k,
+            # Only the text is read from the hits; without this filter
+            # each hit hauls its 1024-float embedding back over the wire
+            "_source": ["text"],
             "query": {
                 "knn": {
                     "embedding": {
-                        "vector": vector,
+                        "vector": search_vector,
                         "k": top_k
                     }
                 }
             }
         }
 
-        response = requests.post(
-            f"{OPENSEARCH_ENDPOINT}/{RAG_INDEX}/_search",
-            auth=get_awsauth(),
-            json=search_body,
-            timeout=5
-        )
-
-        if response.status_code != 200:
-            log("rag_error", response.text)
-            return []
+        response = opensearch.search(index=RAG_INDEX, body=search_body)
 
-        hits = response.json().get("hits", {}).get("hits", [])
+        hits = response.get("hits", {}).get("hits", [])
         texts = [h["_source"].get("text", "") for h in hits if "_source" in h]
 
+        _rag_cache_put(cache_key, vector, signatures, texts)
+
         log("rag_hits", len(texts))
         return texts
 
@@ -143,35 +407,90 @@ def retrieve_context(query, top_k=3):
 # Bedrock Converse
 # =====================================================
 
-def call_model(model_id, prompt, temperature=0.2, max_tokens=700):
-    start = time.time()
-
-    response = bedrock.converse(
-        modelId=model_id,
-        inferenceConfig={
+# Latency-optimized inference is only offered in these regions; elsewhere
+# the flag is skipped and Bedrock runs standard inference
+LATENCY_OPTIMIZED_REGIONS = {"us-east-2", "us-west-2"}
+DEFAULT_LATENCY = "optimized" if AWS_REGION in LATENCY_OPTIMIZED_REGIONS else "standard"
+
+
+def call_model_stream(model_id, prompt, temperature=0.2, max_tokens=700, latency=None,
+                      static_prefix=None):
+    # A static_prefix is sent as its own content block closed by a
+    # cachePoint, so Bedrock can reuse the processed prefix across
+    # calls. Prefixes below the model's minimum cacheable length just
+    # create no checkpoint, which is harmless.
+    if static_prefix:
+        content = [
+            {"text": static_prefix},
+            {"cachePoint": {"type": "default"}},
+            {"text": prompt}
+        ]
+    else:
+        content = [{"text": prompt}]
+
+    params = {
+        "modelId": model_id,
+        "inferenceConfig": {
             "maxTokens": max_tokens,
             "temperature": temperature
         },
-        messages=[{
+        "messages": [{
             "role": "user",
-            "content": [{"text": prompt}]
+            "content": content
         }]
-    )
+    }
+
+    if (latency or DEFAULT_LATENCY) == "optimized":
+        params["performanceConfig"] = {"latency": "optimized"}
+
+    try:
+        response = bedrock.converse_stream(**params)
+    except ClientError as e:
+        # Not every model accepts cachePoint; retry as a plain prompt
+        # so one rejection doesn't also poison the fallback path
+        code = e.response.get("Error", {}).get("Code")
+        if not (static_prefix and code == "ValidationException"):
+            raise
+
+        log("cache_point_rejected", model_id)
+        params["messages"][0]["content"] = [{"text": static_prefix + prompt}]
+        response = bedrock.converse_stream(**params)
+
+    for event in response["stream"]:
+        delta = event.get("contentBlockDelta")
+        if delta:
+            yield delta["delta"].get("text", "")
+
+
+def call_model(model_id, prompt, temperature=0.2, max_tokens=700, early_stop_json=False, latency=None,
+               static_prefix=None):
+    start = time.time()
+
+    text = ""
+
+    for piece in call_model_stream(model_id, prompt, temperature, max_tokens, latency, static_prefix):
+        text += piece
+
+        # For JSON-only outputs (router, extraction) stop as soon as the
+        # object closes instead of waiting for trailing tokens
+        if early_stop_json and "{" in text and text.count("{") == text.count("}"):
+            break
 
     latency = round(time.time() - start, 3)
     log("bedrock_call", {"model": model_id, "latency": latency})
 
-    return response["output"]["message"]["content"][0]["text"]
+    return text
 
 # =====================================================
 # Router
 # =====================================================
 
-def build_router_prompt(user_query):
-    return f"""
+# The invariant instruction block is a module constant so Bedrock prompt
+# caching can reuse the processed prefix and Python never rebuilds it
+ROUTER_PROMPT_STATIC = """
     You are a deterministic routing engine for NorthStar.
 
-    You must select EXACTLY ONE internal tool.
+    You must select EXACTLY ONE internal tool and extract its arguments.
 
     STRICT RULES:
     - Output ONLY valid JSON.
@@ -179,53 +498,97 @@ def build_router_prompt(user_query):
     - No markdown.
     - No additional text.
     - Never answer the user question.
+    - If an argument value is missing, return null for it.
 
     Available tools:
 
     1. get_policy_details
     Use for coverage, benefits, limits, inclusions, exclusions, or policy content.
+    Arguments: policy_id (string)
 
     2. check_document_requirements
     Use for required documents, paperwork, submission requirements.
+    Arguments: policy_id (string)
 
     3. get_claim_status
     Use for claim progress, payment status, claim IDs.
+    Arguments: claim_id (string)
 
     If unsure, choose the most conservative tool.
 
     Response format:
-    {{
+    {
     "tool": "<tool_name>",
     "confidence": "high|medium|low",
-    "reason": "<one sentence>"
-    }}
+    "reason": "<one sentence>",
+    "arguments": { ... }
+    }
+    """
+
 
+def build_router_prompt(user_query):
+    return f"""
     User request:
     \"\"\"{user_query}\"\"\"
     """
 
-def route_query(query):
+# Fast-path classifier: skip the Bedrock router round-trip when exactly
+# one tool's keywords match, fall through to the LLM otherwise
+CLAIM_RE = re.compile(r"\bclaim\b", re.I)
+POLICY_RE = re.compile(r"\b(policy|coverage|deductible|limit)\b", re.I)
+DOC_RE = re.compile(r"\b(document|paperwork|required|upload)\b", re.I)
+
+KEYWORD_ROUTES = [
+    (CLAIM_RE, "get_claim_status"),
+    (DOC_RE, "check_document_requirements"),
+    (POLICY_RE, "get_policy_details")
+]
+
+
+def keyword_route(query):
+    matches = [tool for pattern, tool in KEYWORD_ROUTES if pattern.search(query)]
+
+    if len(matches) == 1:
+        return {
+            "tool": matches[0],
+            "confidence": "high",
+            "reason": "keyword"
+        }
+
+    return None
+
+
+def route_and_extract(query):
+    # Keyword fast path skips the router but still needs one extraction
+    # call; the LLM path gets tool and arguments from a single call
+    decision = keyword_route(query)
+
+    if decision:
+        log("routing_decision", decision)
+        arguments = extract_arguments(query, decision["tool"])
+        return decision, arguments
+
     try:
-        raw = call_model(ROUTER_MODEL, build_router_prompt(query), temperature=0)
+        raw = call_model(ROUTER_MODEL, build_router_prompt(query), temperature=0, early_stop_json=True,
+                         static_prefix=ROUTER_PROMPT_STATIC)
     except Exception as e:
         log("router_primary_failed", str(e))
-        raw = call_model(FALLBACK_MODEL, build_router_prompt(query), temperature=0)
+        raw = call_model(FALLBACK_MODEL, build_router_prompt(query), temperature=0, early_stop_json=True,
+                         latency="standard", static_prefix=ROUTER_PROMPT_STATIC)
 
     decision = safe_json(raw)
     log("routing_decision", decision)
-    return decision
+
+    arguments = decision.pop("arguments", None) or {}
+    return decision, arguments
 
 # =====================================================
 # Entity Extraction
 # =====================================================
 
-def build_extraction_prompt(query, tool_name):
-    return f"""
+EXTRACTION_PROMPT_STATIC = """
     You are an argument extraction engine.
 
-    Extract structured arguments required for the tool:
-    {tool_name}
-
     Rules:
     - Return ONLY valid JSON
     - Do NOT explain
@@ -243,20 +606,28 @@ def build_extraction_prompt(query, tool_name):
     check_document_requirements:
         - policy_id (string)
 
+    Response format:
+    {
+      "arguments": { ... }
+    }
+    """
+
+
+def build_extraction_prompt(query, tool_name):
+    return f"""
+    Extract structured arguments required for the tool:
+    {tool_name}
+
     User query:
     \"\"\"{query}\"\"\"
-
-    Response format:
-    {{
-      "arguments": {{ ... }}
-    }}
     """
 
 def extract_arguments(query, tool_name):
     prompt = build_extraction_prompt(query, tool_name)
 
     try:
-        raw = call_model(SYNTH_MODEL, prompt, temperature=0)
+        raw = call_model(SYNTH_MODEL, prompt, temperature=0, early_stop_json=True,
+                         static_prefix=EXTRACTION_PROMPT_STATIC)
     except Exception as e:
         log("extraction_failed", str(e))
         return {}
@@ -268,99 +639,196 @@ def extract_arguments(query, tool_name):
 # Tool Invocation
 # =====================================================
 
-def invoke_tool(decision, query, arguments=None):
-    mapping = {
-        "get_policy_details": GET_POLICY_FUNCTION,
-        "check_document_requirements": CHECK_DOC_FUNCTION,
-        "get_claim_status": GET_CLAIM_FUNCTION
-    }
+TOOL_HANDLERS = {
+    "get_policy_details": tools.get_policy_details.lambda_handler,
+    "check_document_requirements": tools.check_document_requirements.lambda_handler,
+    "get_claim_status": tools.get_claim_status.lambda_handler
+}
+
+
+# Created on first use: no current tool runs out-of-process, so cold
+# starts should not pay for this client
+_lambda_client = None
+
+
+def invoke_async(function_name, payload):
+    """Fire-and-forget invoke of another Lambda (InvocationType=Event).
+
+    Returns as soon as the event is queued; for side-effect stages
+    (notifications, analytics) whose result never feeds synthesis.
+    """
+    global _lambda_client
+
+    if _lambda_client is None:
+        _lambda_client = boto3.client("lambda", region_name=AWS_REGION,
+                                      config=BOTO_CONFIG)
 
+    _lambda_client.invoke(
+        FunctionName=function_name,
+        InvocationType="Event",
+        Payload=orjson.dumps(payload)
+    )
+
+
+def invoke_tool(decision, query, arguments=None):
     tool_name = decision.get("tool")
-    function_name = mapping.get(tool_name)
+    handler = TOOL_HANDLERS.get(tool_name)
 
-    if not function_name:
+    if not handler:
         log("invalid_tool", {"tool": tool_name})
         return {"error": "Invalid tool selected"}
 
     payload = arguments if arguments else {"query": query}
 
+    # Tools flagged async in the routing decision run off the critical
+    # path; synthesis proceeds without their result
+    if decision.get("async"):
+        executor.submit(handler, payload, None)
+        log("tool_call_async", {"tool": tool_name})
+        return {}
+
     start = time.time()
 
     try:
-        response = lambda_client.invoke(
-            FunctionName=function_name,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload)
-        )
-
-        status_code = response.get("StatusCode")
-
-        if status_code != 200:
-            log("lambda_status_error", {
-                "function": function_name,
-                "status": status_code
-            })
-            return {"error": "Downstream service error"}
-
-        raw_payload = response["Payload"].read()
-        result = json.loads(raw_payload)
-
-        # If Lambda returned an error
-        if response.get("FunctionError"):
-            log("lambda_function_error", {
-                "function": function_name,
-                "error": result
-            })
-            return {"error": "Downstream function execution failed"}
+        result = handler(payload, None)
 
         latency = round(time.time() - start, 3)
         log("tool_call", {
-            "function": function_name,
+            "tool": tool_name,
             "latency": latency
         })
 
-        # Unwrap API Gateway style responses
-        if isinstance(result, dict) and "body" in result:
-            try:
-                return json.loads(result["body"])
-            except Exception:
-                return {"error": "Invalid downstream response format"}
-
         return result
 
     except Exception as e:
-        log("lambda_invoke_exception", str(e))
+        log("tool_exception", str(e))
         return {"error": "Tool invocation failed"}
 
 # =====================================================
 # Memory
 # =====================================================
 
+# Reuse the key builders instead of re-allocating them per query
+SESSION_KEY = Key("session_id")
+TIMESTAMP_KEY = Key("timestamp")
+
+# Sort key of the per-session marker item that feeds the sessions GSI;
+# it carries no conversation turn and sorts below every real timestamp
+SESSION_MARKER_TS = "0" * 16
+
+
 def get_history(session_id, limit=5):
     response = table.query(
-        KeyConditionExpression=Key("session_id").eq(session_id),
+        KeyConditionExpression=(
+            SESSION_KEY.eq(session_id) & TIMESTAMP_KEY.gt(SESSION_MARKER_TS)
+        ),
         ScanIndexForward=False,
         Limit=limit
     )
     return response.get("Items", [])
 
+# Conversation writes go through a long-lived background thread; the
+# handler only blocks on the queue drain right before returning, so the
+# put_item overlaps response construction and nothing is lost to freeze
+_persist_queue = queue.Queue()
+
+
+def _persist_worker():
+    while True:
+        item = _persist_queue.get()
+        try:
+            table.put_item(Item=item)
+        except Exception as e:
+            log("persist_failed", str(e))
+        finally:
+            _persist_queue.task_done()
+
+
+threading.Thread(target=_persist_worker, daemon=True).start()
+
+
+# Sessions already marked by this container; the marker write is
+# idempotent, this just avoids repeating it every turn
+_marked_sessions = set()
+
+
 def store_message(session_id, user, assistant):
-    table.put_item(
-        Item={
+    if session_id not in _marked_sessions:
+        _marked_sessions.add(session_id)
+        # One marker item per session feeds the sessions GSI, so the
+        # web UI can list sessions with a query instead of a scan; the
+        # preview (first user message) lets the sidebar label sessions
+        # without touching the conversation items
+        _persist_queue.put({
             "session_id": session_id,
-            "timestamp": datetime.utcnow().isoformat(),
-            "user": user,
-            "assistant": assistant
-        }
-    )
+            "timestamp": SESSION_MARKER_TS,
+            "gsi_pk": "SESSIONS",
+            "preview": user[:60]
+        })
+
+    _persist_queue.put({
+        "session_id": session_id,
+        # Zero-padded epoch µs keeps the string sort key ordered and
+        # stops two writes in the same millisecond from colliding. The
+        # ts# prefix sorts every new item after the ISO-8601 keys
+        # written before this format existed ("t" > "2"), so mixed
+        # sessions keep their turns in chronological order
+        "timestamp": f"ts#{time.time_ns() // 1000:016d}",
+        "user": user,
+        "assistant": assistant
+    })
+
+
+def flush_messages():
+    _persist_queue.join()
 
 # =====================================================
 # Synthesis
 # =====================================================
 
-def build_synthesis_prompt(user_query, tool_result, history, rag_context):
+# Prompt length drives synth-model latency and cost, so history is
+# clipped per turn and capped by an overall character budget
+MAX_TURN_CHARS = 400
+MAX_HISTORY_CHARS = 4000
 
-    return f"""
+# Retrieved chunks get the same treatment: each is clipped before the
+# synthesis prompt is built so a handful of long PDF chunks can't blow
+# the input token budget
+MAX_CHUNK_CHARS = 1500
+
+
+def _truncate(text, max_chars=MAX_CHUNK_CHARS):
+    return text if len(text) <= max_chars else text[:max_chars]
+
+
+def format_rag_context(chunks):
+    return "\n---\n".join(_truncate(chunk) for chunk in chunks)
+
+
+def format_history(history):
+    lines = []
+    budget = MAX_HISTORY_CHARS
+
+    # get_history returns newest-first; keep the most recent turns
+    for item in history:
+        user = str(item.get("user", ""))[:MAX_TURN_CHARS]
+        assistant = str(item.get("assistant", ""))[:MAX_TURN_CHARS]
+
+        entry = f"User: {user}\nAssistant: {assistant}"
+
+        if len(entry) > budget:
+            break
+
+        budget -= len(entry)
+        lines.append(entry)
+
+    lines.reverse()
+    return "\n\n".join(lines)
+
+
+# All invariant rules sit in the cacheable prefix; only the per-request
+# data sections are rebuilt each call
+SYNTHESIS_PROMPT_STATIC = """
     You are NorthStar, operating in STRICT EVIDENCE MODE.
 
     You are NOT allowed to use prior knowledge.
@@ -377,17 +845,6 @@ def build_synthesis_prompt(user_query, tool_result, history, rag_context):
 
     "I did not find references to this in the policy documents."
 
-    ------------------------------------------------------------
-    User Question:
-    {user_query}
-
-    Verified Tool Data:
-    {json.dumps(tool_result, indent=2)}
-
-    Retrieved Policy Context:
-    {rag_context}
-    ------------------------------------------------------------
-
     RESPONSE RULES:
 
     - Extract information directly from the provided data.
@@ -396,14 +853,36 @@ def build_synthesis_prompt(user_query, tool_result, history, rag_context):
     - Do not explain system issues unless tool_result contains an error.
     - Do not include generic industry explanations.
     - Keep the response factual and grounded.
-
-    Provide the final answer now.
     """
 
 
-def generate_response(query, tool_result, history):
+# The section scaffolding never changes, so it is kept as prebuilt
+# fragments and joined around the per-request values instead of being
+# re-rendered through an f-string on every call
+_SYNTH_HEAD = (
+    "\n    ------------------------------------------------------------"
+    "\n    Recent Conversation:\n    "
+)
+_SYNTH_QUESTION = "\n\n    User Question:\n    "
+_SYNTH_TOOL = "\n\n    Verified Tool Data:\n    "
+_SYNTH_CONTEXT = "\n\n    Retrieved Policy Context:\n    "
+_SYNTH_TAIL = (
+    "\n    ------------------------------------------------------------"
+    "\n\n    Provide the final answer now.\n    "
+)
+
+
+def build_synthesis_prompt(user_query, tool_result, history, rag_context):
+    return "".join((
+        _SYNTH_HEAD, format_history(history),
+        _SYNTH_QUESTION, user_query,
+        _SYNTH_TOOL, orjson.dumps(tool_result).decode(),
+        _SYNTH_CONTEXT, format_rag_context(rag_context),
+        _SYNTH_TAIL
+    ))
 
-    rag_context = retrieve_context(query)
+
+def generate_response(query, tool_result, history, rag_context):
 
     # Hard guardrail: prevent hallucination
     if not rag_context and (not tool_result or tool_result == {}):
@@ -412,55 +891,143 @@ def generate_response(query, tool_result, history):
     prompt = build_synthesis_prompt(query, tool_result, history, rag_context)
 
     try:
-        return call_model(SYNTH_MODEL, prompt, temperature=0.2)
+        return call_model(SYNTH_MODEL, prompt, temperature=0.2,
+                          static_prefix=SYNTHESIS_PROMPT_STATIC)
+    except Exception as e:
+        log("synth_primary_failed", str(e))
+        return call_model(FALLBACK_MODEL, prompt, temperature=0.1, latency="standard",
+                          static_prefix=SYNTHESIS_PROMPT_STATIC)
+
+
+def generate_response_stream(query, tool_result, history, rag_context):
+    """Yield synthesis tokens as they arrive, for streaming transports.
+
+    API Gateway buffers Lambda responses, so lambda_handler still joins
+    the full answer; a Function URL / SSE front door can consume this
+    generator directly for sub-second time-to-first-token.
+    """
+    if not rag_context and (not tool_result or tool_result == {}):
+        yield "I did not find references to this in the policy documents."
+        return
+
+    prompt = build_synthesis_prompt(query, tool_result, history, rag_context)
+
+    try:
+        yield from call_model_stream(SYNTH_MODEL, prompt, temperature=0.2,
+                                     static_prefix=SYNTHESIS_PROMPT_STATIC)
     except Exception as e:
         log("synth_primary_failed", str(e))
-        return call_model(FALLBACK_MODEL, prompt, temperature=0.1)
+        yield from call_model_stream(FALLBACK_MODEL, prompt, temperature=0.1, latency="standard",
+                                     static_prefix=SYNTHESIS_PROMPT_STATIC)
 
 # =====================================================
 # Lambda Handler
 # =====================================================
 
+def answer_query(query, session_id, history_future, rag_future):
+    decision, arguments = route_and_extract(query)
+
+    log("extracted_arguments", arguments)
+
+    tool_result = invoke_tool(decision, query, arguments)
+
+    history = history_future.result()
+    rag_context = rag_future.result()
+
+    final_answer = generate_response(query, tool_result, history, rag_context)
+
+    store_message(session_id, query, final_answer)
+
+    return {
+        "answer": final_answer,
+        "tool_used": decision.get("tool"),
+        "confidence": decision.get("confidence")
+    }
+
+
 def lambda_handler(event, context):
     try:
         log("incoming_event", event)
 
-        body = json.loads(event.get("body", "{}"))
+        body = orjson.loads(event.get("body", "{}"))
         query = body.get("query")
+        queries = body.get("queries")
         session_id = body.get("session_id", "default")
 
-        if not query:
+        if not query and not queries:
             return {
                 "statusCode": 400,
-                "body": json.dumps({"error": "Missing query"})
+                "body": orjson.dumps({"error": "Missing query"}).decode()
             }
 
-        history = get_history(session_id)
-        decision = route_query(query)
-        tool_name = decision.get("tool")
-
-        arguments = extract_arguments(query, tool_name)
-
-        log("extracted_arguments", arguments)
+        # History and RAG retrieval depend only on the parsed body, so
+        # kick both off immediately and let them overlap routing,
+        # extraction and the tool call
+        history_future = executor.submit(get_history, session_id)
+
+        if queries:
+            # Batch mode: submit every retrieval up front so the
+            # embeddings and kNN searches overlap the sequential
+            # routing/synthesis passes below
+            rag_futures = [executor.submit(retrieve_context, q) for q in queries]
+
+            answers = [
+                answer_query(q, session_id, history_future, rag_future)
+                for q, rag_future in zip(queries, rag_futures)
+            ]
+
+            response = {
+                "statusCode": 200,
+                "body": orjson.dumps({"answers": answers}).decode()
+            }
+        else:
+            rag_future = executor.submit(retrieve_context, query)
 
-        tool_result = invoke_tool(decision, query, arguments)
+            result = answer_query(query, session_id, history_future, rag_future)
 
-        final_answer = generate_response(query, tool_result, history)
+            response = {
+                "statusCode": 200,
+                "body": orjson.dumps(result).decode()
+            }
 
-        store_message(session_id, query, final_answer)
-
-        return {
-            "statusCode": 200,
-            "body": json.dumps({
-                "answer": final_answer,
-                "tool_used": decision.get("tool"),
-                "confidence": decision.get("confidence")
-            })
-        }
+        # Drain pending writes before the Lambda freezes
+        flush_messages()
+        return response
 
     except Exception as e:
         logger.exception("Unhandled error")
         return {
             "statusCode": 500,
-            "body": json.dumps({"error": "Internal server error"})
-        }
\ No newline at end of file
+            "body": orjson.dumps({"error": "Internal server error"}).decode()
+        }
+
+# =====================================================
+# Pre-warm (Provisioned Concurrency)
+# =====================================================
+
+def _warm():
+    # Touch each downstream service so the TLS handshakes, credential
+    # resolution and connection pools are established during init,
+    # which is not billed against any request
+    try:
+        table.meta.client.describe_table(TableName=CONVERSATION_TABLE)
+    except Exception as e:
+        log("warmup_failed", str(e))
+
+    try:
+        # Tiny Titan call: opens the Bedrock connection and seeds the
+        # embedding cache with a harmless entry
+        embed_text(" ")
+    except Exception as e:
+        log("warmup_failed", str(e))
+
+    try:
+        # ping() is a HEAD /; aoss may reject it, but the handshake and
+        # pooled connection survive either way
+        opensearch.ping()
+    except Exception as e:
+        log("warmup_failed", str(e))
+
+
+if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") == "provisioned-concurrency":
+    _warm()
\ No newline at end of file
@@ -0,0 +1,3 @@
+from . import get_policy_details
+from . import get_claim_status
+from . import check_document_requirements
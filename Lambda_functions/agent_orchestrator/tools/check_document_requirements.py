@@ -1,8 +1,15 @@
-import json
+import orjson
 import boto3
 import os
+from botocore.config import Config
 
-s3 = boto3.client("s3")
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True
+)
+
+s3 = boto3.client("s3", config=BOTO_CONFIG)
 
 BUCKET = os.environ["AWS_S3_BUCKET_NAME"]
 DATA_PREFIX = os.environ.get("AWS_INSURANCE_DATA", "")
@@ -18,14 +25,14 @@ def load_document_rules():
             Bucket=BUCKET,
             Key=f"{DATA_PREFIX}/document_rules.json"
         )
-        DOCUMENT_RULES_CACHE = json.loads(response["Body"].read())
+        DOCUMENT_RULES_CACHE = orjson.loads(response["Body"].read())
 
     return DOCUMENT_RULES_CACHE
 
 
 def lambda_handler(event, context):
     loss_type = event.get("loss_type")
-    submitted_docs = event.get("documents_submitted", [])
+    submitted_docs = set(event.get("documents_submitted", []))
 
     if not loss_type:
         return {"error": "loss_type is required"}
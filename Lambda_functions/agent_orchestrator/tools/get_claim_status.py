@@ -0,0 +1,39 @@
+import boto3
+import os
+from botocore.config import Config
+from decimal import Decimal
+
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True
+)
+
+dynamodb = boto3.resource("dynamodb", config=BOTO_CONFIG)
+
+CLAIMS_TABLE = os.environ.get("CLAIMS_TABLE", "northstar-claims")
+
+table = dynamodb.Table(CLAIMS_TABLE)
+
+
+def lambda_handler(event, context):
+    claim_id = event.get("claim_id")
+
+    if not claim_id:
+        return {"error": "claim_id is required"}
+
+    try:
+        response = table.get_item(Key={"claim_id": claim_id})
+        claim = response.get("Item")
+
+        if not claim:
+            return {"error": "Claim not found"}
+
+        # DynamoDB numbers come back as Decimal, which json can't serialize
+        return {
+            key: int(value) if isinstance(value, Decimal) else value
+            for key, value in claim.items()
+        }
+
+    except Exception as e:
+        return {"error": str(e)}
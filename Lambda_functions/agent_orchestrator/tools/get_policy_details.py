@@ -0,0 +1,63 @@
+import orjson
+import boto3
+import os
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True
+)
+
+s3 = boto3.client("s3", config=BOTO_CONFIG)
+
+BUCKET = os.environ["AWS_S3_BUCKET_NAME"]
+DATA_PREFIX = os.environ.get("AWS_INSURANCE_DATA", "")
+
+POLICIES_CACHE = None
+POLICIES_ETAG = None
+
+
+def load_policies():
+    global POLICIES_CACHE, POLICIES_ETAG
+
+    params = {
+        "Bucket": BUCKET,
+        "Key": f"{DATA_PREFIX}/policies.json"
+    }
+
+    if POLICIES_ETAG:
+        params["IfNoneMatch"] = POLICIES_ETAG
+
+    try:
+        response = s3.get_object(**params)
+    except ClientError as e:
+        # 304 Not Modified: the cached copy is still current
+        if e.response.get("ResponseMetadata", {}).get("HTTPStatusCode") == 304:
+            return POLICIES_CACHE
+        raise
+
+    POLICIES_CACHE = orjson.loads(response["Body"].read())
+    POLICIES_ETAG = response.get("ETag")
+
+    return POLICIES_CACHE
+
+
+def lambda_handler(event, context):
+    policy_id = event.get("policy_id")
+
+    if not policy_id:
+        return {"error": "policy_id is required"}
+
+    try:
+        policies = load_policies()
+        policy = policies.get(policy_id)
+
+        if not policy:
+            return {"error": "Policy not found"}
+
+        return policy
+
+    except Exception as e:
+        return {"error": str(e)}
\ No newline at end of file
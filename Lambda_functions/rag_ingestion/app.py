@@ -1,11 +1,13 @@
+import gzip
 import json
 import boto3
 import os
-import uuid
 import requests
-from io import BytesIO
-from pypdf import PdfReader
-from requests_aws4auth import AWS4Auth
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+import pypdfium2 as pdfium
+from datetime import datetime, timezone
+from requests_aws4auth import AWS4Auth, AWS4SigningKey
 
 # ------------------------------------------------
 # Environment
@@ -15,53 +17,167 @@ REGION = os.environ["AWS_REGION"]
 INDEX_NAME = os.environ["RAG_INDEX"]
 OPENSEARCH_ENDPOINT = os.environ["OPENSEARCH_ENDPOINT"]
 
-s3 = boto3.client("s3")
-bedrock = boto3.client("bedrock-runtime")
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"mode": "adaptive", "max_attempts": 3},
+    tcp_keepalive=True
+)
+
+s3 = boto3.client("s3", config=BOTO_CONFIG)
+bedrock = boto3.client("bedrock-runtime", config=BOTO_CONFIG)
 
 session = boto3.Session()
 credentials = session.get_credentials()
 
-awsauth = AWS4Auth(
-    credentials.access_key,
+# Derive the date-scoped SigV4 signing key once at init instead of
+# re-running the HMAC chain inside the signer; an ingestion run never
+# spans a UTC date rollover within one Lambda invocation
+signing_key = AWS4SigningKey(
     credentials.secret_key,
     REGION,
     "aoss",
+    datetime.now(timezone.utc).strftime("%Y%m%d")
+)
+
+awsauth = AWS4Auth(
+    credentials.access_key,
+    signing_key,
     session_token=credentials.token
 )
 
+# Keep-alive session so consecutive bulk flushes reuse one TLS
+# connection to the collection endpoint
+http = requests.Session()
+
 # ------------------------------------------------
 # Extract PDF Text
 # ------------------------------------------------
 
-def extract_text_from_pdf(bucket, key):
-    obj = s3.get_object(Bucket=bucket, Key=key)
+S3_BLOCK_SIZE = 1024 * 1024
+
+
+class RangedS3Reader:
+    """Seekable file-like view of an S3 object backed by ranged GETs.
+
+    The PDF parser seeks around the file (xref table at the end first,
+    then individual objects), so the whole PDF no longer has to be
+    buffered up front; only the 1 MiB blocks actually touched are
+    downloaded, and parsing starts as soon as the first block lands.
+    """
+
+    def __init__(self, bucket, key):
+        self._bucket = bucket
+        self._key = key
+        self._size = s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        self._pos = 0
+        self._blocks = {}
+
+    def _block(self, index):
+        block = self._blocks.get(index)
+
+        if block is None:
+            start = index * S3_BLOCK_SIZE
+            end = min(start + S3_BLOCK_SIZE, self._size) - 1
+            obj = s3.get_object(
+                Bucket=self._bucket,
+                Key=self._key,
+                Range=f"bytes={start}-{end}"
+            )
+            block = obj["Body"].read()
+            self._blocks[index] = block
+
+        return block
 
-    pdf_bytes = obj["Body"].read()
-    pdf_stream = BytesIO(pdf_bytes)
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._size - self._pos
 
-    reader = PdfReader(pdf_stream)
+        size = max(0, min(size, self._size - self._pos))
+        parts = []
 
-    text = ""
-    for page in reader.pages:
-        extracted = page.extract_text()
-        if extracted:
-            text += extracted + "\n"
+        while size > 0:
+            index, offset = divmod(self._pos, S3_BLOCK_SIZE)
+            piece = self._block(index)[offset:offset + size]
+            if not piece:
+                break
+            parts.append(piece)
+            self._pos += len(piece)
+            size -= len(piece)
+
+        return b"".join(parts)
+
+    def readinto(self, buffer):
+        # pdfium pulls data through readinto, not read; without this
+        # method PdfDocument rejects the object outright
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=0):
+        if whence == 0:
+            self._pos = offset
+        elif whence == 1:
+            self._pos += offset
+        else:
+            self._pos = self._size + offset
+
+        self._pos = max(0, min(self._pos, self._size))
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def seekable(self):
+        return True
+
+    def readable(self):
+        return True
+
+
+def iter_pdf_text(bucket, key):
+    # pypdfium2 wraps the PDFium C++ parser; text extraction runs in
+    # native code instead of pypdf's pure-Python content-stream parsing
+    pdf = pdfium.PdfDocument(RangedS3Reader(bucket, key))
+
+    try:
+        for page in pdf:
+            textpage = page.get_textpage()
+            extracted = textpage.get_text_range()
+            textpage.close()
+            page.close()
+
+            if extracted:
+                yield extracted + "\n"
+    finally:
+        pdf.close()
 
-    return text.strip()
 # ------------------------------------------------
 # Chunk Text
 # ------------------------------------------------
 
-def chunk_text(text, chunk_size=1000, overlap=150):
-    chunks = []
+def iter_chunks(pages, chunk_size=1000, overlap=150):
+    # Sliding window over the page stream, tracked by offset: each
+    # chunk is materialized with exactly one slice at yield time, and
+    # the consumed prefix is compacted once per page rather than
+    # re-copying the buffer after every chunk
+    step = chunk_size - overlap
+    buffer = ""
     start = 0
 
-    while start < len(text):
-        end = start + chunk_size
-        chunks.append(text[start:end])
-        start += chunk_size - overlap
+    for page_text in pages:
+        if start:
+            buffer = buffer[start:]
+            start = 0
 
-    return chunks
+        buffer += page_text
+
+        while len(buffer) - start >= chunk_size:
+            yield buffer[start:start + chunk_size]
+            start += step
+
+    tail = buffer[start:].strip()
+    if tail:
+        yield tail
 
 # ------------------------------------------------
 # Embed
@@ -78,30 +194,123 @@ def embed_text(text):
     result = json.loads(response["body"].read())
     return result["embedding"]
 
+
+def embed_texts(texts):
+    # Ingestion is bound by Bedrock round-trips, so fan the independent
+    # per-chunk calls out over threads; boto3 clients are thread-safe
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        return list(pool.map(embed_text, texts))
+
 # ------------------------------------------------
-# Index Chunk
+# Bulk Index
 # ------------------------------------------------
 
-def index_chunk(chunk_id, text, metadata):
-    vector = embed_text(text)
+# OpenSearch Serverless caps a _bulk request at 10 MiB
+BULK_FLUSH_BYTES = 10 * 1024 * 1024
 
-    document = {
-        "text": text,
-        "embedding": vector,
-        "metadata": metadata
-    }
 
-    url = f"{OPENSEARCH_ENDPOINT}/{INDEX_NAME}/_doc"
-
-    response = requests.post(
-        url,
+def _post_bulk(payload):
+    # A bulk batch is megabytes of JSON-encoded floats; level-1 gzip
+    # shrinks it several-fold for little CPU, and the serverless
+    # endpoint accepts compressed bodies out of the box
+    response = http.post(
+        f"{OPENSEARCH_ENDPOINT}/{INDEX_NAME}/_bulk",
         auth=awsauth,
-        headers={"Content-Type": "application/json"},
-        json=document
+        headers={
+            "Content-Type": "application/x-ndjson",
+            "Content-Encoding": "gzip",
+            "Accept-Encoding": "gzip"
+        },
+        data=gzip.compress(payload.encode(), compresslevel=1)
     )
 
     if response.status_code not in [200, 201]:
-        raise Exception(f"Indexing failed: {response.text}")
+        raise Exception(f"Bulk indexing failed: {response.text}")
+
+    return response.json()
+
+
+def _flush_bulk(entries, retry=True):
+    result = _post_bulk("".join(entries))
+
+    if not result.get("errors"):
+        return
+
+    # Only the rejected items go back out, and only once
+    failed = [
+        entry
+        for entry, item in zip(entries, result.get("items", []))
+        if item.get("index", {}).get("status") not in (200, 201)
+    ]
+
+    if failed:
+        if retry:
+            _flush_bulk(failed, retry=False)
+        else:
+            raise Exception(f"Bulk indexing failed for {len(failed)} chunks")
+
+
+def bulk_index_chunks(documents):
+    batch = []
+    batch_bytes = 0
+
+    for document in documents:
+        entry = '{"index":{}}\n' + json.dumps(document) + "\n"
+        entry_bytes = len(entry.encode())
+
+        if batch and batch_bytes + entry_bytes > BULK_FLUSH_BYTES:
+            _flush_bulk(batch)
+            batch = []
+            batch_bytes = 0
+
+        batch.append(entry)
+        batch_bytes += entry_bytes
+
+    if batch:
+        _flush_bulk(batch)
+
+# ------------------------------------------------
+# Pipeline
+# ------------------------------------------------
+
+# Chunks are embedded and indexed in batches of this many, so the
+# pipeline holds one batch in memory rather than the whole document
+EMBED_BATCH_SIZE = 64
+
+# With RAG_VECTOR_INT8=1 embeddings are stored quantized to int8:
+# a quarter of the index footprint and much shorter JSON. Requires the
+# index mapping to declare the embedding field with data_type byte,
+# and the orchestrator must send queries with the same flag set.
+RAG_VECTOR_INT8 = os.environ.get("RAG_VECTOR_INT8", "") == "1"
+
+
+def _quantize_int8(vector):
+    max_abs = max(abs(v) for v in vector)
+    if not max_abs:
+        return [0] * len(vector)
+    scale = 127.0 / max_abs
+    return [max(-128, min(127, round(v * scale))) for v in vector]
+
+
+def embed_and_index(chunks, source_key, chunk_offset):
+    vectors = embed_texts(chunks)
+
+    if RAG_VECTOR_INT8:
+        vectors = [_quantize_int8(vector) for vector in vectors]
+
+    documents = [
+        {
+            "text": chunk,
+            "embedding": vector,
+            "metadata": {
+                "source": source_key,
+                "chunk_index": chunk_offset + i
+            }
+        }
+        for i, (chunk, vector) in enumerate(zip(chunks, vectors))
+    ]
+
+    bulk_index_chunks(documents)
 
 # ------------------------------------------------
 # Handler (EventBridge Format)
@@ -122,25 +331,31 @@ def lambda_handler(event, context):
 
         print(f"Processing file: {bucket}/{key}")
 
-        text = extract_text_from_pdf(bucket, key)
+        # Extraction, chunking, embedding and indexing run as a
+        # pipeline: each batch of chunks is embedded in parallel and
+        # bulk-indexed while later pages are still being parsed
+        batch = []
+        total_chunks = 0
 
-        if not text:
-            return {"status": "empty_document"}
+        for chunk in iter_chunks(iter_pdf_text(bucket, key)):
+            batch.append(chunk)
 
-        chunks = chunk_text(text)
+            if len(batch) >= EMBED_BATCH_SIZE:
+                embed_and_index(batch, key, total_chunks)
+                total_chunks += len(batch)
+                batch = []
 
-        for i, chunk in enumerate(chunks):
-            chunk_id = str(uuid.uuid4())
-            metadata = {
-                "source": key,
-                "chunk_index": i
-            }
-            index_chunk(chunk_id, chunk, metadata)
+        if batch:
+            embed_and_index(batch, key, total_chunks)
+            total_chunks += len(batch)
+
+        if total_chunks == 0:
+            return {"status": "empty_document"}
 
         return {
             "status": "indexed",
             "file": key,
-            "chunks": len(chunks)
+            "chunks": total_chunks
         }
 
     except Exception as e:
@@ -2,9 +2,9 @@ import streamlit as st
 import requests
 import boto3
 import os
-import time
 import uuid
 from boto3.dynamodb.conditions import Key
+from requests.adapters import HTTPAdapter
 
 # ==========================================================
 # Environment Variables
@@ -15,11 +15,26 @@ DYNAMO_TABLE = os.environ["CONVERSATION_TABLE"]
 AWS_REGION = os.environ["AWS_REGION"]
 
 # ==========================================================
-# AWS DynamoDB
+# Shared Clients
 # ==========================================================
 
-dynamodb = boto3.resource("dynamodb", region_name=AWS_REGION)
-table = dynamodb.Table(DYNAMO_TABLE)
+# Streamlit reruns this script on every interaction; cache_resource
+# keeps one boto3 resource (service-model parsing, connection pool)
+# and one requests session (TLS reuse to the agent API) per process
+
+@st.cache_resource
+def get_table():
+    dynamodb = boto3.resource("dynamodb", region_name=AWS_REGION)
+    return dynamodb.Table(DYNAMO_TABLE)
+
+@st.cache_resource
+def get_http_session():
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+table = get_table()
+http = get_http_session()
 
 # ==========================================================
 # Page Config
@@ -84,15 +99,34 @@ if "messages" not in st.session_state:
 # Load Conversations from DynamoDB
 # ==========================================================
 
+@st.cache_data(ttl=60)
 def list_sessions():
+    # The orchestrator writes one marker item per session into the
+    # sessions GSI, so listing is a query over markers instead of a
+    # scan over every message; cached so reruns don't re-hit DynamoDB
     try:
-        response = table.scan(ProjectionExpression="session_id")
-        sessions = list(set([item["session_id"] for item in response["Items"]]))
-        return sessions
+        sessions = []
+        kwargs = {
+            "IndexName": "sessions",
+            "KeyConditionExpression": Key("gsi_pk").eq("SESSIONS"),
+            "ProjectionExpression": "session_id, preview"
+        }
+
+        while True:
+            response = table.query(**kwargs)
+            sessions.extend(response.get("Items", []))
+
+            last_key = response.get("LastEvaluatedKey")
+            if not last_key:
+                return sessions
+            kwargs["ExclusiveStartKey"] = last_key
     except Exception:
         return []
 
+@st.cache_data(ttl=300, max_entries=64)
 def load_session(session_id):
+    # Streamlit reruns the whole script per interaction; without this,
+    # revisiting a session costs a DynamoDB query every time
     response = table.query(
         KeyConditionExpression=Key("session_id").eq(session_id),
         ScanIndexForward=True
@@ -100,10 +134,31 @@ def load_session(session_id):
     items = response.get("Items", [])
     messages = []
     for item in items:
+        # Skip the session marker item; it carries no conversation turn
+        if "user" not in item:
+            continue
         messages.append({"role": "user", "content": item["user"]})
         messages.append({"role": "assistant", "content": item["assistant"]})
     return messages
 
+# ==========================================================
+# Agent API
+# ==========================================================
+
+@st.cache_data(ttl=30, max_entries=128, show_spinner=False)
+def call_agent(query, session_id):
+    # A rerun or an immediate retry of the same question within the
+    # TTL reuses the answer instead of paying a full RAG+LLM round trip
+    response = http.post(
+        API_URL,
+        json={
+            "query": query,
+            "session_id": session_id
+        },
+        timeout=60
+    )
+    return response.json()
+
 # ==========================================================
 # Sidebar UI
 # ==========================================================
@@ -119,9 +174,12 @@ with st.sidebar:
     sessions = list_sessions()
 
     for session in sessions:
-        if st.button(session[:8], key=session):
-            st.session_state.session_id = session
-            st.session_state.messages = load_session(session)
+        session_id = session["session_id"]
+        label = session.get("preview") or session_id[:8]
+
+        if st.button(label, key=session_id):
+            st.session_state.session_id = session_id
+            st.session_state.messages = load_session(session_id)
             st.rerun()
 
 # ==========================================================
@@ -154,28 +212,13 @@ if prompt := st.chat_input("Ask about your policy, claim, or documents..."):
         confidence_level = ""
 
         try:
-            response = requests.post(
-                API_URL,
-                json={
-                    "query": prompt,
-                    "session_id": st.session_state.session_id
-                },
-                timeout=60
-            )
-
-            data = response.json()
+            data = call_agent(prompt, st.session_state.session_id)
             answer = data.get("answer", "No response.")
             confidence_level = data.get("confidence", "unknown")
 
-            # =========================================
-            # Typing Animation
-            # =========================================
-            for word in answer.split():
-                full_response += word + " "
-                placeholder.markdown(full_response + "▌")
-                time.sleep(0.015)
-
-            # Final render
+            # The full answer has already arrived; render it once
+            # instead of replaying it word-by-word with sleeps
+            full_response = answer
             placeholder.markdown(full_response)
 
             # Confidence Badge
@@ -191,4 +234,8 @@ if prompt := st.chat_input("Ask about your policy, claim, or documents..."):
 
     st.session_state.messages.append(
         {"role": "assistant", "content": full_response}
-    )
\ No newline at end of file
+    )
+
+    # The stored history for this session just changed; drop the
+    # memoized copy so the next sidebar click reloads it
+    load_session.clear()
\ No newline at end of file